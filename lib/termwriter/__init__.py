@@ -6,4 +6,5 @@ __author__ = "Mark Kim"
 from .widgets import *
 from .jsonrenderer import *
 from .termrenderer import *
+from .broadcast import *
 
@@ -0,0 +1,396 @@
+__copyright__ = "Copyright 2019-2022 Mark Kim"
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__author__ = "Mark Kim"
+__all__ = [ "BroadcastServer", "BroadcastException" ]
+
+import os
+import json
+import stat
+import socket
+import selectors
+import threading
+from collections import deque
+from .termrenderer import TermRenderer
+
+
+##############################################################################
+# EXPORTS
+
+class BroadcastServer:
+    """
+    Serve rendered frames to any number of viewers over a Unix domain socket.
+    Each frame is rendered once per terminal width in use, and viewers that
+    are up to date are sent only the lines that changed.
+
+    Frames are rendered by the publisher for the widths already in use, and
+    by a worker thread for new widths, so the thread serving the viewers
+    never waits on a render.  A published widget may be rendered again at
+    any time until the next frame is published, so publish a new widget for
+    each frame rather than changing one that's already been published.
+    """
+
+    MAX_WIDTH = 1000
+    MAX_REQUEST = 1024
+
+    def __init__(self, path, renderer=None):
+        self.path = path
+        self.renderer = BroadcastServer.checkRenderer(renderer if renderer else TermRenderer())
+        self.lock = threading.Lock()
+        self.renderLock = threading.Lock()
+        self.requested = threading.Condition(self.lock)
+        self.frame = BroadcastFrame(0, None, self.renderer)
+        self.connections = {}
+        self.widths = set()
+        self.selector = None
+        self.listener = None
+        self.waker = None
+        self.wakee = None
+        self.thread = None
+        self.worker = None
+        self.running = False
+
+    def start(self):
+        self.unlinkStale()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.waker, self.wakee = socket.socketpair()
+        self.waker.setblocking(False)
+        self.wakee.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self.wakee, selectors.EVENT_READ)
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+        self.worker.start()
+
+        return self
+
+    def close(self):
+        if self.running:
+            with self.lock:
+                self.running = False
+                self.requested.notify()
+
+            self.wake()
+            self.thread.join()
+            self.worker.join()
+
+            for conn in list(self.connections.values()):
+                self.disconnect(conn)
+
+            self.selector.close()
+            self.listener.close()
+            self.waker.close()
+            self.wakee.close()
+            os.unlink(self.path)
+
+        return self
+
+    def unlinkStale(self):
+        try:
+            mode = os.stat(self.path).st_mode
+        except FileNotFoundError:
+            return
+
+        # Leave anything that isn't a socket for bind() to complain about
+        if not stat.S_ISSOCK(mode):
+            return
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+        else:
+            raise BroadcastException(f"Another server is already listening on '{self.path}'")
+        finally:
+            probe.close()
+
+    def publish(self, widget, renderer=None, budget=None):
+        renderer = BroadcastServer.checkRenderer(renderer if renderer else self.renderer)
+
+        with self.lock:
+            frame = BroadcastFrame(self.frame.seq + 1, widget, renderer, budget, self.frame)
+            widths = set(self.widths)
+
+        with self.renderLock:
+            for width in widths:
+                frame.prepare(width)
+
+        with self.lock:
+            self.frame = frame
+
+        self.wake()
+
+        return self
+
+    def wake(self):
+        try:
+            self.waker.send(b"\0")
+        except BlockingIOError:
+            pass
+
+    def work(self):
+        while True:
+            with self.lock:
+                while self.running and not self.widths - self.frame.renders.keys():
+                    self.requested.wait()
+
+                if not self.running:
+                    break
+
+                frame = self.frame
+                width = next(iter(self.widths - frame.renders.keys()))
+
+            with self.renderLock:
+                frame.prepare(width)
+
+            self.wake()
+
+    def serve(self):
+        while self.running:
+            for key, events in self.selector.select():
+                if key.fileobj is self.listener:
+                    self.accept()
+                elif key.fileobj is self.wakee:
+                    self.drain()
+                else:
+                    conn = key.data
+
+                    if events & selectors.EVENT_READ:
+                        self.read(conn)
+
+                    if events & selectors.EVENT_WRITE and conn.sock.fileno() >= 0:
+                        self.write(conn)
+
+            self.dispatch()
+            self.updateInterests()
+
+    def dispatch(self):
+        with self.lock:
+            frame = self.frame
+
+        for conn in list(self.connections.values()):
+            if conn.width is not None and conn.seq != frame.seq and conn.width in frame.renders:
+                conn.queue(frame)
+
+    def accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except BlockingIOError:
+            return
+
+        sock.setblocking(False)
+        conn = BroadcastConnection(sock)
+
+        with self.lock:
+            self.connections[sock] = conn
+
+        self.selector.register(sock, selectors.EVENT_READ, conn)
+
+    def drain(self):
+        try:
+            while self.wakee.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def read(self, conn):
+        try:
+            data = conn.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            return self.disconnect(conn)
+
+        conn.inbuf += data
+
+        while b"\n" in conn.inbuf:
+            line, conn.inbuf = conn.inbuf.split(b"\n", 1)
+
+            try:
+                width = json.loads(line)["width"]
+            except (ValueError, KeyError, TypeError, RecursionError):
+                return self.disconnect(conn)
+
+            if type(width) is not int:
+                return self.disconnect(conn)
+
+            # A new width, or a viewer that lost track, starts with a full
+            # frame once one has been rendered at that width
+            conn.width = min(max(width, 1), BroadcastServer.MAX_WIDTH)
+            conn.seq = 0
+            self.updateWidths()
+
+        # Requests are a few bytes, so anything longer isn't a viewer
+        if len(conn.inbuf) > BroadcastServer.MAX_REQUEST:
+            return self.disconnect(conn)
+
+    def write(self, conn):
+        try:
+            conn.flush()
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self.disconnect(conn)
+
+    def disconnect(self, conn):
+        with self.lock:
+            self.connections.pop(conn.sock, None)
+
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+
+        conn.sock.close()
+        self.updateWidths()
+
+    def updateWidths(self):
+        with self.lock:
+            self.widths = { c.width for c in self.connections.values() if c.width is not None }
+            self.requested.notify()
+
+    def updateInterests(self):
+        for conn in list(self.connections.values()):
+            events = selectors.EVENT_READ
+
+            if conn.pending:
+                events |= selectors.EVENT_WRITE
+
+            if events != conn.events:
+                self.selector.modify(conn.sock, events, conn)
+                conn.events = events
+
+    @staticmethod
+    def checkRenderer(renderer):
+        # Viewers are sent lines of text, with a width they choose
+        if not isinstance(renderer, TermRenderer):
+            raise BroadcastException(f"Cannot broadcast with {type(renderer).__name__}; use a TermRenderer")
+
+        return renderer
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class BroadcastException(Exception):
+    pass
+
+
+##############################################################################
+# UTILITIES
+
+class BroadcastFrame:
+    def __init__(self, seq, widget, renderer, budget=None, previous=None):
+        self.seq = seq
+        self.widget = widget
+        self.renderer = renderer
+        self.budget = budget
+        self.previous = previous
+        self.renders = {}
+        self.messages = {}
+
+        # Only the frame before this one is ever diffed against
+        if previous:
+            previous.previous = None
+
+    def prepare(self, width):
+        if width in self.renders:
+            return self
+
+        if self.widget is None:
+            lines = []
+        elif self.budget is not None:
+            lines = str(self.renderer(self.widget, 0, width, budget=self.budget)).split("\n")
+        else:
+            lines = str(self.renderer(self.widget, 0, width)).split("\n")
+
+        previous = self.previous
+        self.messages[(width, False)] = self.encode(width, lines=lines)
+
+        if previous and width in previous.renders:
+            self.messages[(width, True)] = self.diff(width, lines, previous)
+
+        # Publish the render last; it's what marks this width as ready
+        self.renders[width] = lines
+
+        return self
+
+    def message(self, width, seq):
+        # The publisher drops self.previous once the next frame is published,
+        # so it's read just once here
+        previous = self.previous
+        diffable = bool(previous and seq == previous.seq and width in previous.renders)
+        key = (width, diffable)
+
+        # The previous frame may have been rendered at this width after this one
+        if key not in self.messages:
+            self.messages[key] = self.diff(width, self.renders[width], previous)
+
+        return self.messages[key]
+
+    def diff(self, width, lines, previous):
+        before = previous.renders[width]
+
+        return self.encode(width,
+            base = previous.seq,
+            height = len(lines),
+            changes = [
+                [i, l] for i, l in enumerate(lines)
+                if i >= len(before) or before[i] != l
+            ],
+        )
+
+    def encode(self, width, **fields):
+        message = { "seq" : self.seq, "width" : width, **fields }
+
+        return (json.dumps(message) + "\n").encode("utf-8")
+
+
+class BroadcastConnection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b""
+        self.pending = deque()
+        self.sent = 0
+        self.width = None
+        self.seq = 0
+        self.events = selectors.EVENT_READ
+
+    def queue(self, frame):
+        if self.width is None or frame.seq == 0:
+            return
+
+        # A viewer that hasn't kept up skips to a full copy of the latest frame
+        if len(self.pending) > 1 or (self.pending and not self.sent):
+            while len(self.pending) > (1 if self.sent else 0):
+                self.pending.pop()
+
+            self.seq = 0
+
+        self.pending.append(frame.message(self.width, self.seq))
+        self.seq = frame.seq
+
+    def flush(self):
+        while self.pending:
+            message = self.pending[0]
+            self.sent += self.sock.send(message[self.sent:])
+
+            if self.sent < len(message):
+                break
+
+            self.pending.popleft()
+            self.sent = 0
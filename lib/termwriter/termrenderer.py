@@ -2,9 +2,11 @@ __copyright__ = "Copyright 2019-2022 Mark Kim"
 __license__ = "Apache 2.0"
 __version__ = "1.0.0"
 __author__ = "Mark Kim"
-__all__ = [ "TermRenderer", "TermWidgetRenderer", "TermWidgetRendered", "TermRendererException" ]
+__all__ = [ "TermRenderer", "TermWidgetRenderer", "TermWidgetRendered", "TermRendererException", "RenderBudget" ]
 
 import os
+import time
+import weakref
 
 
 ##############################################################################
@@ -13,6 +15,7 @@ import os
 class TermRenderer:
     def __init__(self):
         self.widgetRenderers = {}
+        self.budget = None
         self.setWidgetRenderer("nonetype", BlankWidgetRenderer(self))
         self.setWidgetRenderer("str", StrWidgetRenderer(self))
         self.setWidgetRenderer("int", IntWidgetRenderer(self))
@@ -20,6 +23,7 @@ class TermRenderer:
         self.setWidgetRenderer("section", SectionWidgetRenderer(self))
         self.setWidgetRenderer("flexbox", FlexBoxWidgetRenderer(self))
         self.setWidgetRenderer("textbox", TextBoxWidgetRenderer(self))
+        self.setWidgetRenderer("textfile", TextFileWidgetRenderer(self))
         self.setWidgetRenderer("table", TableWidgetRenderer(self))
         self.setWidgetRenderer("hrule", HRuleWidgetRenderer(self))
         self.setWidgetRenderer("softbreak", ControlWidgetRenderer(self))
@@ -35,7 +39,7 @@ class TermRenderer:
 
         return widgetRenderer
 
-    def __call__(self, widget, minwidth=0, maxwidth=None, **kwargs):
+    def __call__(self, widget, minwidth=0, maxwidth=None, budget=None, **kwargs):
         termWidget = TermWidget(widget)
         widgetType = termWidget.getType()
         renderer = self.getWidgetRenderer(widgetType)
@@ -46,6 +50,22 @@ class TermRenderer:
         if not maxwidth:
             maxwidth = Terminal.width()
 
+        if budget is not None:
+            if not isinstance(budget, RenderBudget):
+                budget = RenderBudget(budget)
+
+            self.budget = budget.start()
+            kwargs["renderBudget"] = budget
+
+        # Collapse deep subtrees once we're out of time
+        budget = kwargs.get("renderBudget")
+        depth = kwargs.get("renderDepth", 0)
+
+        if budget and depth >= budget.collapseDepth and termWidget.isContainer() and budget.expired():
+            return budget.collapse(widget, widgetType, depth, kwargs.get("sectionTitle"))
+
+        kwargs["renderDepth"] = depth + 1
+
         return renderer(widget, minwidth, maxwidth, **kwargs)
 
 
@@ -136,6 +156,53 @@ class TermRendererException(Exception):
     pass
 
 
+class RenderBudget:
+    """
+    Time allowed for a render.  Renderers check it as they go and, once it's
+    spent, truncate or collapse what's left and note what they skipped.
+    """
+
+    def __init__(self, seconds, collapseDepth=3, placeholder="[...]"):
+        self.seconds = seconds
+        self.collapseDepth = collapseDepth
+        self.placeholder = placeholder
+        self.deadline = None
+        self.skipped = {}
+
+    def start(self):
+        self.deadline = time.monotonic() + self.seconds
+        self.skipped = {}
+
+        return self
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def skip(self, widget, message, sectionTitle=None):
+        if sectionTitle is not None:
+            message += f" in section '{sectionTitle}'"
+
+        # Widgets rendered more than once (e.g., FlexBox cells resized to fit
+        # the row) are reported by what was skipped from the last render
+        self.skipped[id(widget)] = message
+
+        return self
+
+    def collapse(self, widget, widgetType, depth, sectionTitle=None):
+        if hasattr(widget, "title"):
+            widgetType += f" '{widget.title}'"
+
+        self.skip(widget, f"{widgetType} at depth {depth} collapsed", sectionTitle)
+
+        return TermWidgetRendered([self.placeholder])
+
+    def degraded(self):
+        return len(self.skipped) > 0
+
+    def report(self):
+        return "\n".join(self.skipped.values())
+
+
 ##############################################################################
 # WIDGET RENDERERS
 
@@ -173,8 +240,10 @@ class SectionWidgetRenderer(TermWidgetRenderer):
     def __call__(self, section, minwidth=0, maxwidth=None, **kwargs):
         # Render content
         kwargs["sectionDepth"] = kwargs.get("sectionDepth", 0) + 1
+        kwargs["sectionTitle"], sectionTitle = section.title, kwargs.get("sectionTitle")
         renderedContent = self.termRenderer(section.contents[0], minwidth, maxwidth, **kwargs)
         kwargs["sectionDepth"] = kwargs.get("sectionDepth", 0) - 1
+        kwargs["sectionTitle"] = sectionTitle
 
         # Render title
         renderedTitle = self.termRenderer(f" {section.title} ", 0, maxwidth, **kwargs)
@@ -188,6 +257,8 @@ class SectionWidgetRenderer(TermWidgetRenderer):
 
 
 class FlexBoxWidgetRenderer(TermWidgetRenderer):
+    MIN_WRAP_WIDTH = 20
+
     def __call__(self, flexbox, minwidth=0, maxwidth=None, **kwargs):
         rflexbox = TermWidgetRendered()
         rrow = TermWidgetRendered()
@@ -195,8 +266,18 @@ class FlexBoxWidgetRenderer(TermWidgetRenderer):
         crow = []
         nrow = 0
         ncol = 0
+        budget = kwargs.get("renderBudget")
+        numskipped = 0
+
+        for i, c in enumerate(flexbox.contents):
+            if (nrow or ncol) and budget and budget.expired():
+                numskipped = sum(TermWidget(x).isPrintable() for x in flexbox.contents[i:])
+
+                if numskipped:
+                    budget.skip(flexbox, f"flexbox truncated by {numskipped} boxes", kwargs.get("sectionTitle"))
+
+                break
 
-        for c in flexbox.contents:
             rcell = self.termRenderer(c, minwidth, maxwidth, **kwargs)
             twidget = TermWidget(c)
             cellType = twidget.getType()
@@ -209,6 +290,16 @@ class FlexBoxWidgetRenderer(TermWidgetRenderer):
             elif ncol and rrow.width() + flexbox.hpadding + rcell.width() > maxwidth:
                 breakType = "soft"
 
+                # Boxes that wrap may fit in what's left of the row
+                remaining = maxwidth - rrow.width() - flexbox.hpadding
+
+                if remaining >= FlexBoxWidgetRenderer.MIN_WRAP_WIDTH:
+                    rnarrow = self.termRenderer(c, minwidth, remaining, **kwargs)
+
+                    if rnarrow.width() <= remaining:
+                        rcell = rnarrow
+                        breakType = None
+
             # Resize
             if breakType == "soft":
                 widths = [rc.width() for rc in rcrow]
@@ -226,7 +317,7 @@ class FlexBoxWidgetRenderer(TermWidgetRenderer):
                     if ncol:
                         rrow.padRight(flexbox.hpadding)
 
-                    rrow.appendRight(self.termRenderer(c2, cw, maxwidth, **kwargs))
+                    rrow.appendRight(self.termRenderer(c2, cw, cw, **kwargs))
                     ncol += 1
 
             if breakType:
@@ -254,21 +345,70 @@ class FlexBoxWidgetRenderer(TermWidgetRenderer):
 
         rflexbox.appendBelow(rrow)
 
+        if numskipped:
+            rflexbox.padBelow(flexbox.vpadding)
+            rflexbox.appendBelow(TermWidgetRendered([f"+{numskipped} more"]))
+
         return rflexbox
 
 
 class TextBoxWidgetRenderer(TermWidgetRenderer):
+    def __init__(self, termRenderer):
+        super().__init__(termRenderer)
+        self.wrapIndexes = weakref.WeakKeyDictionary()
+
     def __call__(self, textbox, minwidth=0, maxwidth=None, **kwargs):
         rtextbox = TermWidgetRendered()
+        wrapIndex = None
+
+        if getattr(textbox, "wrap", False):
+            wrapIndex = self.wrapIndexes.setdefault(textbox, WrapIndex())
+
+        budget = kwargs.get("renderBudget")
+
+        for i, c in enumerate(textbox.contents):
+            if i and budget and budget.expired():
+                numskipped = len(textbox.contents) - i
+                budget.skip(textbox, f"textbox truncated by {numskipped} lines", kwargs.get("sectionTitle"))
+                rtextbox.appendBelow(TermWidgetRendered([f"+{numskipped} more"]))
+                break
 
-        for c in textbox.contents:
-            rcell = self.termRenderer(c)
+            if wrapIndex and isinstance(c, str):
+                rcell = TermWidgetRendered(wrapIndex.wrap(i, c, maxwidth))
+            elif wrapIndex and TermWidget(c).getType() == "textfile":
+                rcell = self.termRenderer(c, 0, maxwidth, wrap=True, **kwargs)
+            else:
+                rcell = self.termRenderer(c, 0, maxwidth, **kwargs)
 
             rtextbox.appendBelow(rcell)
 
+        if wrapIndex:
+            wrapIndex.truncate(len(textbox.contents))
+
         return rtextbox
 
 
+class TextFileWidgetRenderer(TermWidgetRenderer):
+    def __init__(self, termRenderer):
+        super().__init__(termRenderer)
+        self.wrapIndexes = weakref.WeakKeyDictionary()
+
+    def __call__(self, textfile, minwidth=0, maxwidth=None, wrap=False, **kwargs):
+        lines = textfile.lines()
+        width = textfile.width()
+
+        if wrap:
+            wrapIndex = self.wrapIndexes.setdefault(textfile, WrapIndex())
+            wrapIndex.truncate(len(lines))
+            lines = [w for i, l in enumerate(lines) for w in wrapIndex.wrap(i, l, maxwidth)]
+            width = min(width, maxwidth)
+
+        rtextfile = TermWidgetRendered(lines)
+
+        # Hold the widest line seen so far so the box doesn't jitter as it scrolls
+        return rtextfile.pack(0, width)
+
+
 class TableWidgetRenderer(TermWidgetRenderer):
     def __call__(self, table, minwidth=0, maxwidth=None, **kwargs):
         numcols = table.numcols()
@@ -277,9 +417,17 @@ class TableWidgetRenderer(TermWidgetRenderer):
         widths = [0] * numcols
         matrix = []
         rtable = TermWidgetRendered()
+        budget = kwargs.get("renderBudget") if table.truncate else None
+        numskipped = 0
 
         # Render
         for irow in range(numrows):
+            if irow and budget and budget.expired():
+                numskipped = numrows - irow
+                numrows = irow
+                budget.skip(table, f"table truncated by {numskipped} rows", kwargs.get("sectionTitle"))
+                break
+
             matrix += [[]]
 
             for icol in range(numcols):
@@ -310,6 +458,10 @@ class TableWidgetRenderer(TermWidgetRenderer):
 
             rtable.appendBelow(rrow)
 
+        if numskipped:
+            rtable.padBelow(table.vpadding)
+            rtable.appendBelow(TermWidgetRendered([f"+{numskipped} more"]))
+
         return rtable
 
 
@@ -335,6 +487,9 @@ class TermWidget:
 
         return wtype
 
+    def isContainer(self):
+        return hasattr(self.widget, "contents") and isinstance(self.widget.contents, list)
+
     def isPrintable(self):
         wtype = self.getType()
 
@@ -344,6 +499,78 @@ class TermWidget:
         return True
 
 
+class WrapIndex:
+    """
+    Word-wrap break positions of each paragraph of a TextBox, cached by width
+    so re-laying out at a previously seen width, or after appending to the
+    last paragraph, only wraps the paragraphs that need it.
+    """
+
+    MAX_WIDTHS = 8
+
+    def __init__(self):
+        self.paragraphs = []
+
+    def wrap(self, iparagraph, text, width):
+        while len(self.paragraphs) <= iparagraph:
+            self.paragraphs += [("", {})]
+
+        cachedText, breaks = self.paragraphs[iparagraph]
+
+        if cachedText is not text and cachedText != text:
+            breaks = {}
+            self.paragraphs[iparagraph] = (text, breaks)
+
+        if width not in breaks:
+            if len(breaks) >= WrapIndex.MAX_WIDTHS:
+                del breaks[next(iter(breaks))]
+
+            breaks[width] = WrapIndex.breaks(text, width)
+
+        return [text[b:e] for b, e in breaks[width]]
+
+    def truncate(self, numparagraphs):
+        del self.paragraphs[numparagraphs:]
+
+        return self
+
+    @staticmethod
+    def breaks(text, width):
+        width = max(width, 1)
+        length = len(text)
+        breaks = []
+        begin = 0
+
+        while length - begin > width:
+            cut = text.rfind(" ", begin, begin + width + 1)
+            end = len(text[begin:cut].rstrip(" ")) + begin if cut > begin else begin
+
+            if end == begin:
+                word = begin
+
+                while word < length and text[word] == " ":
+                    word += 1
+
+                # Drop indentation that leaves no room for the first word
+                if word > begin:
+                    begin = word
+                    continue
+
+                # Split words that don't fit on a line of their own
+                end = cut = begin + width
+
+            breaks += [(begin, end)]
+            begin = cut
+
+            while begin < length and text[begin] == " ":
+                begin += 1
+
+        if begin < length or not breaks:
+            breaks += [(begin, len(text[begin:].rstrip(" ")) + begin)]
+
+        return breaks
+
+
 class Terminal:
     DEFAULT_COLS = 120
     cachedCols = None
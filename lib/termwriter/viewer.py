@@ -0,0 +1,101 @@
+__copyright__ = "Copyright 2019-2022 Mark Kim"
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__author__ = "Mark Kim"
+
+import sys
+import json
+import errno
+import shutil
+import signal
+import socket
+
+
+##############################################################################
+# MAIN
+
+def main():
+    if len(sys.argv) != 2:
+        sys.stderr.write(f"Usage: {sys.argv[0]} SOCKET\n")
+        sys.exit(errno.EINVAL)
+
+    try:
+        view(sys.argv[1])
+    except KeyboardInterrupt:
+        print("")
+        sys.exit(errno.EOWNERDEAD)
+    except OSError as e:
+        sys.stderr.write(f"{sys.argv[0]}: {e}\n")
+        sys.exit(e.errno or 1)
+
+
+def view(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    viewer = BroadcastViewer(sock, sys.stdout)
+
+    signal.signal(signal.SIGWINCH, lambda signum, frame: viewer.requestWidth())
+    viewer.requestWidth()
+
+    for line in sock.makefile("rb"):
+        viewer.update(json.loads(line))
+
+
+##############################################################################
+# UTILITIES
+
+class BroadcastViewer:
+    def __init__(self, sock, out):
+        self.sock = sock
+        self.out = out
+        self.seq = 0
+        self.width = None
+        self.lines = []
+
+    def requestWidth(self):
+        # Leave the last column free like Terminal.width() does
+        self.width = shutil.get_terminal_size().columns - 1
+        self.sock.sendall((json.dumps({ "width" : self.width }) + "\n").encode("utf-8"))
+
+    def update(self, message):
+        # Frames for an old width are still in flight after a resize
+        if message["width"] != self.width:
+            return
+
+        before = len(self.lines)
+
+        if "lines" in message:
+            changes = None
+            self.lines = message["lines"]
+
+        elif message["base"] != self.seq:
+            return self.requestWidth()
+
+        else:
+            changes = message["changes"]
+            height = message["height"]
+            self.lines += [""] * (height - len(self.lines))
+            del self.lines[height:]
+
+            for i, l in changes:
+                self.lines[i] = l
+
+        # Lines can only be redrawn in place while the frame fits the terminal;
+        # a taller frame has scrolled, so it's redrawn in full
+        rows = shutil.get_terminal_size().lines
+
+        if changes is None or max(before, len(self.lines)) > rows:
+            self.out.write("\x1b[H\x1b[2J" + "\n".join(self.lines))
+        else:
+            for i, l in changes:
+                self.out.write(f"\x1b[{i+1};1H{l}\x1b[K")
+
+            if len(self.lines) < before:
+                self.out.write(f"\x1b[{len(self.lines)+1};1H\x1b[J")
+
+        self.seq = message["seq"]
+        self.out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,11 @@ __copyright__ = "Copyright 2019-2022 Mark Kim"
 __license__ = "Apache 2.0"
 __version__ = "1.0.0"
 __author__ = "Mark Kim"
+__all__ = [ "Widget", "ControlWidget", "HRule", "SoftBreak", "HardBreak", "ContainerWidget", "Table", "FlexBox", "TextBox", "TextFile", "TextFileException", "Section", "Screen" ]
 
+import os
+import mmap
+from array import array
 from .termrenderer import TermRenderer
 
 
@@ -79,17 +83,19 @@ class ContainerWidget(Widget):
 
 
 class Table(ContainerWidget):
-    def __init__(self, aligns="", hpadding=1, vpadding=0):
+    def __init__(self, aligns="", hpadding=1, vpadding=0, truncate=True):
         super().__init__()
         self.aligns = aligns
         self.hpadding = hpadding
         self.vpadding = vpadding
+        self.truncate = truncate
 
     def jsonable(self):
         jsonable = super().jsonable()
         jsonable["aligns"] = self.aligns
         jsonable["hpadding"] = self.hpadding
         jsonable["vpadding"] = self.vpadding
+        jsonable["truncate"] = self.truncate
 
         return jsonable
 
@@ -150,6 +156,16 @@ class FlexBox(ContainerWidget):
 
 
 class TextBox(ContainerWidget):
+    def __init__(self, *contents, wrap=False, **format):
+        super().__init__(*contents, **format)
+        self.wrap = wrap
+
+    def jsonable(self):
+        jsonable = super().jsonable()
+        jsonable["wrap"] = self.wrap
+
+        return jsonable
+
     def write(self, *args, **kwargs):
         for s in args:
             if isinstance(s, str):
@@ -166,6 +182,207 @@ class TextBox(ContainerWidget):
         return self
 
 
+class TextFile(Widget):
+    """
+    Lines of a file, memory-mapped and indexed lazily so only the lines in
+    view are ever decoded.  Write it to a TextBox to display it.  The view
+    defaults to the last DEFAULT_LINES lines so a large file is never read
+    whole by accident.
+    """
+
+    DEFAULT_LINES = 10
+
+    def __init__(self, path, start=-DEFAULT_LINES, stop=None, encoding="utf-8", errors="replace"):
+        super().__init__()
+
+        # Lines are found by searching for b"\n", which other encodings don't use
+        if "\n".encode(encoding) != b"\n":
+            raise TextFileException(f"Encoding '{encoding}' is not ASCII-compatible")
+
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self.encoding = encoding
+        self.errors = errors
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.reindex()
+
+    def head(self, numlines):
+        return self.range(0, numlines)
+
+    def tail(self, numlines):
+        if not numlines:
+            return self.range(0, 0)
+
+        return self.range(-numlines, None)
+
+    def viewport(self, top, height):
+        return self.range(top, top + height)
+
+    def range(self, start=0, stop=None):
+        self.start = start
+        self.stop = stop
+
+        return self
+
+    def numlines(self):
+        self.refresh()
+        self.index()
+
+        return len(self.offsets) - 1
+
+    def lines(self):
+        self.refresh()
+        start, stop = self.start or 0, self.stop
+
+        # Tails are found by scanning back from the end, without an index
+        if start < 0 and (stop is None or stop < 0) and not self.indexed:
+            spans = self.tailSpans(-start)[start:stop]
+        else:
+            if start < 0 or (stop is not None and stop < 0):
+                self.index()
+            else:
+                self.index(stop)
+
+            offsets = self.offsets
+            spans = [(offsets[i], offsets[i+1]) for i in range(len(offsets) - 1)[start:stop]]
+
+        lines = [self.decode(b, e) for b, e in spans]
+
+        for l in lines:
+            self.widest = max(self.widest, len(l))
+
+        return lines
+
+    def width(self):
+        return self.widest
+
+    def refresh(self):
+        # A rotated log is a different file, so start over with the new one
+        if self.file is not None and self.isRotated():
+            self.close()
+            self.reindex()
+            self.size = 0
+
+        if self.file is None:
+            self.file = open(self.path, "rb")
+
+        size = os.fstat(self.file.fileno()).st_size
+
+        if self.map is None or size != self.size:
+            self.unmap()
+
+            if size:
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.map = b""
+
+            # Appended files keep their index, except an unterminated last
+            # line which may have grown.  Anything else starts over.
+            if size < self.size:
+                self.reindex()
+            elif self.partial:
+                self.offsets.pop()
+
+            self.size = size
+            self.partial = False
+            self.indexed = False
+
+        return self
+
+    def isRotated(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        fstat = os.fstat(self.file.fileno())
+
+        return (stat.st_dev, stat.st_ino) != (fstat.st_dev, fstat.st_ino)
+
+    def reindex(self):
+        self.offsets = array("Q", [0])
+        self.widest = 0
+        self.partial = False
+        self.indexed = False
+
+        return self
+
+    def index(self, stop=None):
+        offsets = self.offsets
+
+        while not self.indexed and (stop is None or len(offsets) <= stop):
+            begin = offsets[-1]
+            end = self.map.find(b"\n", begin)
+
+            if end >= 0:
+                offsets.append(end + 1)
+            else:
+                if begin < self.size:
+                    offsets.append(self.size)
+                    self.partial = True
+
+                self.indexed = True
+
+        return self
+
+    def tailSpans(self, numlines):
+        spans = []
+        end = self.size
+
+        while end > 0 and len(spans) < numlines:
+            begin = self.map.rfind(b"\n", 0, end - 1) + 1
+            spans.append((begin, end))
+            end = begin
+
+        return spans[::-1]
+
+    def decode(self, begin, end):
+        line = self.map[begin:end].decode(self.encoding, self.errors)
+
+        if line.endswith("\n"): line = line[:-1]
+        if line.endswith("\r"): line = line[:-1]
+
+        return line
+
+    def unmap(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+        self.map = None
+
+        return self
+
+    def close(self):
+        self.unmap()
+
+        if self.file is not None:
+            self.file.close()
+
+        self.file = None
+
+        return self
+
+    def jsonable(self):
+        jsonable = super().jsonable()
+        jsonable["path"] = self.path
+        jsonable["contents"] = self.lines()
+
+        return jsonable
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class TextFileException(Exception):
+    pass
+
+
 class Section(ContainerWidget):
     def __init__(self, title, container):
         super().__init__()
@@ -188,8 +405,10 @@ class Section(ContainerWidget):
 
 
 class Screen(Section):
-    def __init__(self, title, renderer=None):
-        self.column = Table("l", vpadding=1)
+    def __init__(self, title, renderer=None, budget=None, broadcast=None):
+        self.budget = budget
+        self.broadcast = broadcast
+        self.column = Table("l", vpadding=1, truncate=False)
         self.textbox = TextBox()
         self.flexbox = FlexBox()
         self.renderer = renderer if renderer else TermRenderer()
@@ -210,5 +429,10 @@ class Screen(Section):
         return container
 
     def __exit__(self, type, value, traceback):
-        print(self.renderer(self))
+        if self.broadcast:
+            self.broadcast.publish(self, self.renderer, self.budget)
+        elif self.budget is not None:
+            print(self.renderer(self, budget=self.budget))
+        else:
+            print(self.renderer(self))
 
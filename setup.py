@@ -21,4 +21,5 @@ setup(
     long_description_content_type = "text/markdown",
                          packages = find_packages("lib"),
                       package_dir = { "": "lib" },
+                     entry_points = { "console_scripts": [ "termwriter-view = termwriter.viewer:main" ] },
 )
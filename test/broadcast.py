@@ -0,0 +1,187 @@
+#!/bin/sh
+
+##############################################################################
+# BOOTSTRAP
+#
+# Include ../lib in the search path so we can find termwriter when running locally
+# then call python3 or python, whichever exists.
+# (See https://unix.stackexchange.com/questions/20880)
+#
+if "true" : '''\'
+then
+    export PYTHONPATH="$(dirname $0)/../lib:$PYTHONPATH"
+    pythoncmd=python
+
+    if command -v python3 >/dev/null; then
+        pythoncmd=python3
+    fi
+
+    exec "$pythoncmd" "$0" "$@"
+    exit 127
+fi
+'''
+
+##############################################################################
+# PYTHON CODE BEGINS HERE
+
+__copyright__ = "Copyright 2019-2022 Mark Kim"
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__author__ = "Mark Kim"
+
+import os
+import errno
+import sys
+import json
+import socket
+import tempfile
+from io import StringIO
+from termwriter import Screen
+from termwriter import TextBox
+from termwriter import TermRenderer
+from termwriter import JsonRenderer
+from termwriter import BroadcastServer
+from termwriter import BroadcastException
+from termwriter.viewer import BroadcastViewer
+
+TIMEOUT = 5
+failures = 0
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "broadcast.sock")
+
+    checkStartupGuards(path)
+
+    with BroadcastServer(path) as server:
+        checkRendererGuard(server)
+
+        os.environ["LINES"] = "1000"
+        os.environ["COLUMNS"] = "61"
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        sock.settimeout(TIMEOUT)
+        stream = sock.makefile("rb")
+        viewer = BroadcastViewer(sock, StringIO())
+        viewer.requestWidth()
+
+        server.publish(screen(1))
+        receive(viewer, stream, 1)
+        check(viewer.lines == render(screen(1), 60), "viewer receives the first frame in full")
+
+        for request in MALFORMED_REQUESTS:
+            check(isRejected(path, request), f"server disconnects a client sending {request[:20]!r}")
+
+        check(server.thread.is_alive(), "server survives malformed clients")
+
+        server.publish(screen(2))
+        receive(viewer, stream, 2)
+        check(viewer.lines == render(screen(2), 60), "viewer applies line diffs")
+
+        os.environ["COLUMNS"] = "41"
+        viewer.requestWidth()
+        server.publish(screen(3))
+        receive(viewer, stream, 3)
+        check(viewer.lines == render(screen(3), 40), "viewer follows a resize")
+
+        sock.close()
+
+    check(not os.path.exists(path), "server removes its socket on close")
+
+    print("All checks passed." if not failures else f"{failures} check(s) failed.")
+    sys.exit(1 if failures else 0)
+
+
+MALFORMED_REQUESTS = [
+    b'not json\n',
+    b'{"width": 1e999}\n',
+    b'{"width": Infinity}\n',
+    b'{"width": "80"}\n',
+    b'{"height": 80}\n',
+    b'[80]\n',
+    b'[' * 100000 + b'\n',
+    b'x' * 100000,
+]
+
+
+def checkStartupGuards(path):
+    with open(path, "w") as f:
+        f.write("not a socket")
+
+    try:
+        BroadcastServer(path).start()
+        check(False, "server refuses to replace a regular file")
+    except OSError:
+        check(os.path.exists(path), "server refuses to replace a regular file")
+
+    os.unlink(path)
+
+    with BroadcastServer(path):
+        try:
+            BroadcastServer(path).start()
+            check(False, "server refuses to take over a live socket")
+        except BroadcastException:
+            check(True, "server refuses to take over a live socket")
+
+
+def checkRendererGuard(server):
+    try:
+        server.publish(screen(0), JsonRenderer())
+        check(False, "server refuses a non-terminal renderer")
+    except BroadcastException:
+        check(True, "server refuses a non-terminal renderer")
+
+
+def screen(n):
+    screen = Screen("Broadcast")
+    screen.write(f"Frame {n}")
+
+    for i in range(3):
+        with screen.section(f"Box {i}", TextBox(wrap=True)) as box:
+            box.write(f"Box {i} of frame {n} has enough text in it to wrap.")
+
+    return screen
+
+
+def render(widget, width):
+    return str(TermRenderer()(widget, 0, width)).split("\n")
+
+
+def receive(viewer, stream, seq):
+    while viewer.seq != seq:
+        viewer.update(json.loads(stream.readline()))
+
+
+def isRejected(path, request):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.settimeout(TIMEOUT)
+
+    try:
+        sock.sendall(request)
+
+        return sock.recv(4096) == b""
+    except ConnectionResetError:
+        return True
+    except socket.timeout:
+        return False
+    finally:
+        sock.close()
+
+
+def check(passed, what):
+    global failures
+
+    print(f"{'ok  ' if passed else 'FAIL'} {what}")
+    failures += 0 if passed else 1
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("")
+        sys.exit(errno.EOWNERDEAD)
+
+
+# vim:filetype=python:
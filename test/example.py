@@ -39,10 +39,13 @@ from termwriter import Table
 from termwriter import HRule
 from termwriter import SoftBreak
 from termwriter import HardBreak
+from termwriter import TextFile
 
 
 def main():
-    with Screen('Example Output') as screen:
+    # The budget bounds how long the screen takes to render.  If it runs out,
+    # the rest of the screen is truncated with "+N more" lines instead.
+    with Screen('Example Output', budget=1.0) as screen:
         screen.write('Some description goes here.')
 
         with screen.section('My First Box', TextBox()) as box:
@@ -88,6 +91,15 @@ def main():
                 table.write('Tel:', '+1 111 555 3333')
                 table.write('Email:', 'nobody@nowhere.com')
 
+        with screen.section('My Ninth Box', TextBox()) as box:
+            box.write('You can also show the end of a file:')
+            box.write(TextFile(__file__).tail(1))
+
+        with screen.section('My Tenth Box', TextBox(wrap=True)) as box:
+            box.write('Text in a box made with wrap=True is word-wrapped to fit the '
+                      'space left in the row instead of widening the box to fit the '
+                      'longest line.')
+
 
 if __name__ == "__main__":
     try: